@@ -1,29 +1,59 @@
 
 import streamlit as st
 import sqlite3
+import hashlib
+import threading
+import contextlib
 from datetime import datetime
 import pandas as pd
 
-# Try to import a translator. If not available, provide a simple fallback.
-try:
-    from googletrans import Translator
-    translator = Translator()
-    def translate_text(text, dest='hi'):
-        try:
-            return translator.translate(text, dest=dest).text
-        except Exception:
-            return text + " (translation unavailable)"
-except Exception:
-    translator = None
-    def translate_text(text, dest='hi'):
-        # Simple fallback: return the English text with a note.
-        return text + " (Hindi translation not available - please install googletrans)"
+# Save a short demo CSV of guideline examples (for quick reference).
+# The contents never change, so build and write it once per process rather than on
+# every rerun. No spinner: this runs before st.set_page_config.
+@st.cache_resource(show_spinner=False)
+def _init_demo_csv():
+    pd.DataFrame([
+        {"condition":"Thyroid","diet":"Include selenium-containing foods, avoid processed sugar","exercise":"30 min walk, strength 2x/week"},
+        {"condition":"Sleep Apnea","diet":"Avoid caffeine late, light dinner","exercise":"Breathing exercises, positional sleep"},
+        {"condition":"Heart Risk","diet":"Low saturated fats, high fiber","exercise":"Low-impact cardio, consult physician"}
+    ]).to_csv("healthyhabits_demo_examples.csv", index=False)
+    return True
+
+_init_demo_csv()
 
 DB_PATH = "healthyhabits_profiles.db"
 
 # ----- Database helpers -----
+@st.cache_resource
+def _get_db():
+    # One connection per process, shared by every session thread. A transaction
+    # belongs to the connection, not to a thread, so it is only used under the lock.
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    # WAL lets other processes read the file while this one writes; busy_timeout
+    # waits for their locks instead of failing with "database is locked".
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.row_factory = sqlite3.Row
+    return conn, threading.Lock()
+
+@contextlib.contextmanager
+def get_conn():
+    # Holds the connection lock for the block, so fetch results before leaving it.
+    # Writes also need the transaction: "with get_conn() as conn, conn:".
+    conn, lock = _get_db()
+    with lock:
+        yield conn
+
+@st.cache_resource
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    # Schema check only needs to run once per process, not on every rerun.
+    with get_conn() as conn:
+        _create_schema(conn)
+    return True
+
+def _create_schema(conn):
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -36,74 +66,240 @@ def init_db():
             created_at TEXT
         )
     ''')
+    # One row per (profile, condition) so conditions can be looked up and counted in SQL.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS user_conditions (
+            user_id INTEGER,
+            condition TEXT,
+            PRIMARY KEY (user_id, condition),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_uc_condition ON user_conditions(condition)')
+    # Translations keyed by md5 of the source text, shared across restarts and processes.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS translations (
+            h TEXT,
+            dest TEXT,
+            text TEXT,
+            created_at TEXT,
+            PRIMARY KEY (h, dest)
+        )
+    ''')
+    # Backfill profiles saved before user_conditions existed.
+    c.execute("SELECT id, conditions FROM users WHERE conditions != '' AND id NOT IN (SELECT user_id FROM user_conditions)")
+    c.executemany('INSERT OR IGNORE INTO user_conditions (user_id, condition) VALUES (?, ?)',
+                  [(row["id"], cond) for row in c.fetchall() for cond in row["conditions"].split(",")])
     conn.commit()
-    conn.close()
+
+def save_profiles(rows):
+    # Rows are (name, age, gender, conditions, goal, created_at) tuples with conditions
+    # as a list; the whole batch is one transaction, so it costs one journal sync
+    # instead of one per row. Users are inserted one execute() at a time because each
+    # new id (lastrowid) is needed for its user_conditions rows; only those are batched.
+    with get_conn() as conn, conn:
+        condition_rows = []
+        for name, age, gender, conditions, goal, created_at in rows:
+            cur = conn.execute('INSERT INTO users (name, age, gender, conditions, goal, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                               (name, age, gender, ",".join(conditions), goal, created_at))
+            condition_rows.extend((cur.lastrowid, cond) for cond in conditions)
+        conn.executemany('INSERT OR IGNORE INTO user_conditions (user_id, condition) VALUES (?, ?)',
+                         condition_rows)
+    # New rows: drop the cached table so "View Profiles" picks them up.
+    fetch_profiles.clear()
 
 def save_profile(name, age, gender, conditions, goal):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('INSERT INTO users (name, age, gender, conditions, goal, created_at) VALUES (?, ?, ?, ?, ?, ?)', 
-              (name, age, gender, ",".join(conditions), goal, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+    save_profiles([(name, age, gender, conditions, goal, datetime.now().isoformat())])
+
+def get_profile(profile_id):
+    # Primary-key lookup; returns None if there is no such profile.
+    with get_conn() as conn:
+        return conn.execute('SELECT id, goal FROM users WHERE id = ?', (profile_id,)).fetchone()
+
+def fetch_conditions(user_id):
+    with get_conn() as conn:
+        rows = conn.execute('SELECT condition FROM user_conditions WHERE user_id = ?', (user_id,)).fetchall()
+    return [row["condition"] for row in rows]
+
+PAGE_SIZE = 50
+
+PROFILE_QUERY = "SELECT id, name, age, gender, conditions, goal, created_at FROM users ORDER BY id DESC LIMIT ? OFFSET ?"
+
+@st.cache_data(ttl=300)
+def fetch_profiles(limit=PAGE_SIZE, offset=0):
+    # Newest first; ORDER BY id is served by the rowid, so a page costs O(limit).
+    # Rows come back as plain dicts and read_sql_query is skipped; st.dataframe still
+    # turns them into a DataFrame when rendering. fetch_profiles_df returns one directly.
+    with get_conn() as conn:
+        return [dict(row) for row in conn.execute(PROFILE_QUERY, (limit, offset))]
+
+def fetch_profiles_df(limit=-1, offset=0):
+    # DataFrame of profiles for bulk analysis; limit=-1 reads them all.
+    with get_conn() as conn:
+        return pd.read_sql_query(PROFILE_QUERY, conn, params=(limit, offset))
 
-def fetch_profiles():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM users ORDER BY id DESC", conn)
-    conn.close()
-    return df
+# ----- Translation helpers -----
+# The translator is optional and slow to import, so it is only loaded on the first
+# Hindi request. If it is not available, the English text is shown with a note.
+# st.cache_resource rather than lru_cache: Streamlit re-executes this file on every
+# rerun, which would throw away a module-level cache.
+@st.cache_resource(show_spinner=False)
+def _get_translator():
+    try:
+        from googletrans import Translator
+        return Translator()
+    except Exception:
+        return None
+
+def translation_fallback(text):
+    # Simple fallback: return the English text with a note.
+    if _get_translator() is None:
+        return text + " (Hindi translation not available - please install googletrans)"
+    return text + " (translation unavailable)"
+
+# Recommendation text comes from a fixed rule set, so the same strings are translated
+# over and over; cache them across reruns and sessions, backed by the translations
+# table so they also survive restarts. A failed call raises out of the cached
+# function so the fallback text is never cached.
+@st.cache_data(ttl=60 * 60 * 24, max_entries=1024, show_spinner=False)
+def _translate_cached(texts, dest):
+    keys = [hashlib.md5(text.encode("utf-8")).hexdigest() for text in texts]
+    with get_conn() as conn:
+        rows = conn.execute('SELECT h, text FROM translations WHERE dest = ? AND h IN (%s)' % ",".join("?" * len(keys)),
+                            (dest, *keys)).fetchall()
+    stored = {row["h"]: row["text"] for row in rows}
+    misses = {h: text for h, text in zip(keys, texts) if h not in stored}
+    if misses:
+        translator = _get_translator()
+        if translator is None:
+            raise RuntimeError("googletrans is not installed")
+        # Only texts missing from both caches reach googletrans. Its list form still
+        # makes one request per item (4.0.0-rc1 loops internally); it just saves
+        # issuing the calls one by one here.
+        results = translator.translate(list(misses.values()), dest=dest)
+        new_rows = [(h, dest, result.text, datetime.now().isoformat()) for h, result in zip(misses, results)]
+        with get_conn() as conn, conn:
+            conn.executemany('INSERT OR IGNORE INTO translations (h, dest, text, created_at) VALUES (?, ?, ?, ?)',
+                             new_rows)
+        stored.update((h, text) for h, _, text, _ in new_rows)
+    return [stored[h] for h in keys]
+
+def translate_many(texts, dest='hi'):
+    # Raises if the texts could not be translated; callers show translation_fallback
+    # instead, without keeping it, so the next render tries again.
+    return _translate_cached(tuple(texts), dest)
 
 # ----- Recommendation Engine (simple rule-based) -----
-def generate_recommendations(conditions, goal):
-    diet_recs = []
-    exercise_recs = []
-    sleep_recs = []
-    general_recs = []
+# Rule tables are built once at import; each entry maps a category to the
+# suggestions it adds, in the order they are shown.
+CATEGORIES = ("diet", "exercise", "sleep", "general")
+
+BASE_RULES = {
+    "diet": ("Include more whole foods: vegetables, fruits, lean proteins, and whole grains.",),
+    "exercise": ("Aim for at least 30 minutes of moderate activity daily (walking, yoga, or cycling).",),
+    "sleep": ("Keep consistent sleep schedule. Avoid screens 1 hour before bed.",),
+    "general": ("Stay hydrated and avoid excessive sugary drinks.",),
+}
 
-    # Base suggestions
-    diet_recs.append("Include more whole foods: vegetables, fruits, lean proteins, and whole grains.")
-    exercise_recs.append("Aim for at least 30 minutes of moderate activity daily (walking, yoga, or cycling).")
-    sleep_recs.append("Keep consistent sleep schedule. Avoid screens 1 hour before bed.")
-    general_recs.append("Stay hydrated and avoid excessive sugary drinks.")
+CONDITION_RULES = {
+    "Thyroid": {
+        "diet": ("For thyroid issues: include selenium-rich foods (nuts, seeds) and iodine sources in moderation; avoid highly processed foods and excessive soy.",),
+        "exercise": ("Include strength training twice a week to support metabolism.",),
+    },
+    "Sleep Apnea": {
+        "diet": ("For sleep apnea: avoid heavy meals and caffeine close to bedtime; maintain healthy weight.",),
+        "exercise": ("Practice breathing exercises and consider positional therapy (sleeping on side).",),
+        "sleep": ("Consult a clinician for breathing-related sleep disorders; avoid alcohol near bedtime.",),
+    },
+    "Heart": {
+        "diet": ("Heart-healthy diet: reduce saturated fats, increase fiber, include omega-3 sources like fish or flaxseed.",),
+        "exercise": ("Prefer low-impact cardio like brisk walking; check with a doctor before intense exercise.",),
+        "general": ("Monitor blood pressure and cholesterol regularly.",),
+    },
+}
+
+# Maps each selectable condition to the CONDITION_RULES tag it triggers; conditions
+# without rules of their own (e.g. "Obesity") are simply absent.
+CONDITION_TAGS = {
+    "Thyroid": "Thyroid",
+    "Sleep Apnea": "Sleep Apnea",
+    "Heart Risk": "Heart",
+    "Cardiac History": "Heart",
+}
+
+# Each rule tag gets one bit, in table order, so a profile's conditions pack into
+# a small int mask; rules then fire in table order, keeping bullet order stable.
+_RULE_BITS = tuple((1 << i, rules) for i, rules in enumerate(CONDITION_RULES.values()))
+CONDITION_BITS = {cond: 1 << list(CONDITION_RULES).index(tag) for cond, tag in CONDITION_TAGS.items()}
+
+GOAL_RULES = {
+    "Weight Loss": {
+        "diet": ("Control portion sizes, prefer protein-rich breakfasts, and avoid late-night snacking.",),
+        "exercise": ("Incorporate interval walks or brisk walks to increase calorie burn.",),
+    },
+    "Better Sleep": {
+        "sleep": ("Create a bedtime routine: warm shower, light stretching, and a calm environment.",),
+        "diet": ("Avoid heavy, spicy dinners and caffeine after late afternoon.",),
+    },
+    "Energy Boost": {
+        "diet": ("Include small, frequent balanced meals; add nuts and fruits for healthy snacks.",),
+        "exercise": ("Short morning walks and light stretching improve daytime alertness.",),
+    },
+}
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def _generate_recommendations_cached(mask, goal):
+    # Returns a tuple in CATEGORIES order: immutable, so it is safe to hand out from the cache.
+    buckets = {category: list(BASE_RULES[category]) for category in CATEGORIES}
 
     # Condition-specific adjustments
-    if "Thyroid" in conditions:
-        diet_recs.append("For thyroid issues: include selenium-rich foods (nuts, seeds) and iodine sources in moderation; avoid highly processed foods and excessive soy.")
-        exercise_recs.append("Include strength training twice a week to support metabolism.")
-    if "Sleep Apnea" in conditions:
-        diet_recs.append("For sleep apnea: avoid heavy meals and caffeine close to bedtime; maintain healthy weight.")
-        exercise_recs.append("Practice breathing exercises and consider positional therapy (sleeping on side).")
-        sleep_recs.append("Consult a clinician for breathing-related sleep disorders; avoid alcohol near bedtime.")
-    if "Heart Risk" in conditions or "Cardiac History" in conditions:
-        diet_recs.append("Heart-healthy diet: reduce saturated fats, increase fiber, include omega-3 sources like fish or flaxseed.")
-        exercise_recs.append("Prefer low-impact cardio like brisk walking; check with a doctor before intense exercise.")
-        general_recs.append("Monitor blood pressure and cholesterol regularly.")
+    for bit, rules in _RULE_BITS:
+        if mask & bit:
+            for category, recs in rules.items():
+                buckets[category].extend(recs)
 
     # Goal-specific tweaks
-    if goal == "Weight Loss":
-        diet_recs.append("Control portion sizes, prefer protein-rich breakfasts, and avoid late-night snacking.")
-        exercise_recs.append("Incorporate interval walks or brisk walks to increase calorie burn.")
-    elif goal == "Better Sleep":
-        sleep_recs.append("Create a bedtime routine: warm shower, light stretching, and a calm environment.")
-        diet_recs.append("Avoid heavy, spicy dinners and caffeine after late afternoon.")
-    elif goal == "Energy Boost":
-        diet_recs.append("Include small, frequent balanced meals; add nuts and fruits for healthy snacks.")
-        exercise_recs.append("Short morning walks and light stretching improve daytime alertness.")
+    for category, recs in GOAL_RULES.get(goal, {}).items():
+        buckets[category].extend(recs)
 
     # Collate into text blocks
-    diet_text = "\\n- ".join([""] + diet_recs)
-    exercise_text = "\\n- ".join([""] + exercise_recs)
-    sleep_text = "\\n- ".join([""] + sleep_recs)
-    general_text = "\\n- ".join([""] + general_recs)
-
-    return {
-        "diet": diet_text.strip(),
-        "exercise": exercise_text.strip(),
-        "sleep": sleep_text.strip(),
-        "general": general_text.strip()
-    }
+    return tuple("- " + "\n- ".join(buckets[category]) for category in CATEGORIES)
+
+def generate_recommendations(conditions, goal):
+    mask = 0
+    for c in conditions:
+        mask |= CONDITION_BITS.get(c, 0)
+    return dict(zip(CATEGORIES, _generate_recommendations_cached(mask, goal)))
 
 # ----- Streamlit UI -----
+# (recs key, English label, Hindi label) for each block of recommendations.
+SECTIONS = (
+    ("diet", "Diet Suggestions", "आहार सुझाव"),
+    ("exercise", "Exercise Suggestions", "व्यायाम सुझाव"),
+    ("sleep", "Sleep Suggestions", "नींद सुझाव"),
+    ("general", "General Tips", "सामान्य सलाह"),
+)
+
+def render_recommendations(localized, language):
+    # localized is a session_state dict of {language: recs}, starting with English.
+    # The Hindi version is translated the first time it is shown and kept there,
+    # so switching the language radio back and forth costs no further calls. A failed
+    # translation is shown with a note but not kept, so it is retried next time.
+    if language in localized:
+        recs = localized[language]
+    else:
+        english = localized["English"]
+        try:
+            texts = translate_many([english[key] for key, _, _ in SECTIONS], dest='hi')
+        except Exception:
+            recs = {key: translation_fallback(text) for key, text in english.items()}
+        else:
+            recs = localized[language] = dict(zip((key for key, _, _ in SECTIONS), texts))
+    hindi = language == "हिन्दी"
+    for key, label_en, label_hi in SECTIONS:
+        st.markdown(f"**{label_hi if hindi else label_en}:**")
+        st.write(recs[key])
+
 st.set_page_config(page_title="HealthyHabits - Bilingual Lifestyle Helper", layout="centered")
 
 st.title("HealthyHabits 🌿 — Personalized Lifestyle Recommendations (English / Hindi)")
@@ -113,6 +309,12 @@ init_db()
 
 menu = st.sidebar.selectbox("Menu", ["Create Profile", "View Profiles", "About & Instructions"])
 
+# Generated recommendations belong to the page that produced them.
+if menu != "Create Profile":
+    st.session_state.pop("create_recs", None)
+if menu != "View Profiles":
+    st.session_state.pop("view_recs", None)
+
 if menu == "Create Profile":
     st.header("Create a New Profile")
     col1, col2 = st.columns(2)
@@ -125,71 +327,52 @@ if menu == "Create Profile":
                                      ["Thyroid", "Sleep Apnea", "Heart Risk", "Obesity", "Diabetes", "None"])
         goal = st.selectbox("Primary Goal", ["Weight Loss", "Better Sleep", "Energy Boost", "Healthy Habits"])
 
+    # Recommendations are kept in session state, tagged with the form inputs that
+    # produced them, so they survive the rerun caused by the language radio but are
+    # dropped as soon as the form is edited.
+    inputs = (name, age, gender, tuple(conditions), goal)
     if st.button("Save Profile and Generate Recommendations"):
         if name.strip() == "":
             st.error("Please enter a name.")
+            st.session_state.pop("create_recs", None)
         else:
             save_profile(name, age, gender, conditions, goal)
             st.success(f"Profile saved for {name}.")
-            recs = generate_recommendations(conditions, goal)
-            language = st.radio("Choose Language / भाषा चुनें", ["English", "हिन्दी"])
-            st.subheader("Personalized Recommendations")
-            if language == "English":
-                st.markdown("**Diet Suggestions:**")
-                st.write(recs["diet"])
-                st.markdown("**Exercise Suggestions:**")
-                st.write(recs["exercise"])
-                st.markdown("**Sleep Suggestions:**")
-                st.write(recs["sleep"])
-                st.markdown("**General Tips:**")
-                st.write(recs["general"])
-            else:
-                st.markdown("**आहार सुझाव:**")
-                st.write(translate_text(recs["diet"], dest='hi'))
-                st.markdown("**व्यायाम सुझाव:**")
-                st.write(translate_text(recs["exercise"], dest='hi'))
-                st.markdown("**नींद सुझाव:**")
-                st.write(translate_text(recs["sleep"], dest='hi'))
-                st.markdown("**सामान्य सलाह:**")
-                st.write(translate_text(recs["general"], dest='hi'))
+            st.session_state["create_recs"] = (inputs, {"English": generate_recommendations(conditions, goal)})
+    if st.session_state.get("create_recs", (None,))[0] != inputs:
+        st.session_state.pop("create_recs", None)
+    if "create_recs" in st.session_state:
+        language = st.radio("Choose Language / भाषा चुनें", ["English", "हिन्दी"])
+        st.subheader("Personalized Recommendations")
+        render_recommendations(st.session_state["create_recs"][1], language)
 
 elif menu == "View Profiles":
     st.header("Saved Profiles")
-    df = fetch_profiles()
-    if df.empty:
+    page = st.number_input("Page", min_value=1, value=1, step=1)
+    rows = fetch_profiles(limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
+    if not rows and page == 1:
         st.info("No profiles created yet.")
+    elif not rows:
+        st.info("No profiles on this page.")
     else:
-        st.dataframe(df[['id','name','age','gender','conditions','goal','created_at']])
+        st.dataframe(rows)
         st.markdown("---")
         st.subheader("Generate recommendations for an existing profile")
         selected_id = st.number_input("Enter Profile ID", min_value=1, value=1, step=1)
         if st.button("Generate for Selected ID"):
-            row = df[df['id']==selected_id]
-            if row.empty:
+            row = get_profile(selected_id)
+            if row is None:
                 st.error("Profile ID not found. Choose a valid ID from the table above.")
+                st.session_state.pop("view_recs", None)
             else:
-                conditions = row.iloc[0]['conditions'].split(",") if row.iloc[0]['conditions'] else []
-                goal = row.iloc[0]['goal']
-                recs = generate_recommendations(conditions, goal)
-                language = st.radio("Choose Language / भाषा चुनें (Existing)", ["English", "हिन्दी"], key="viewlang")
-                if language == "English":
-                    st.markdown("**Diet Suggestions:**")
-                    st.write(recs["diet"])
-                    st.markdown("**Exercise Suggestions:**")
-                    st.write(recs["exercise"])
-                    st.markdown("**Sleep Suggestions:**")
-                    st.write(recs["sleep"])
-                    st.markdown("**General Tips:**")
-                    st.write(recs["general"])
-                else:
-                    st.markdown("**आहार सुझाव:**")
-                    st.write(translate_text(recs["diet"], dest='hi'))
-                    st.markdown("**व्यायाम सुझाव:**")
-                    st.write(translate_text(recs["exercise"], dest='hi'))
-                    st.markdown("**नींद सुझाव:**")
-                    st.write(translate_text(recs["sleep"], dest='hi'))
-                    st.markdown("**सामान्य सलाह:**")
-                    st.write(translate_text(recs["general"], dest='hi'))
+                conditions = fetch_conditions(selected_id)
+                goal = row["goal"]
+                st.session_state["view_recs"] = (selected_id, {"English": generate_recommendations(conditions, goal)})
+        if st.session_state.get("view_recs", (None,))[0] != selected_id:
+            st.session_state.pop("view_recs", None)
+        if "view_recs" in st.session_state:
+            language = st.radio("Choose Language / भाषा चुनें (Existing)", ["English", "हिन्दी"], key="viewlang")
+            render_recommendations(st.session_state["view_recs"][1], language)
 
 else:
     st.header("About & Instructions")
@@ -200,11 +383,3 @@ else:
     st.markdown("2) Run the app: streamlit run healthyhabits_app.py")
     st.markdown("3) If translation doesn't work, the app will show English text and a note recommending installing googletrans.")
     st.markdown("What you can extend later: Add daily logging and progress charts, Add reminders or notification via email/SMS, Add personalized meal plans or exercise videos, Integrate with wearable data (step count, sleep metrics)")
-
-# Save a short demo CSV of guideline examples (for quick reference)
-demo_examples = pd.DataFrame([
-    {"condition":"Thyroid","diet":"Include selenium-containing foods, avoid processed sugar","exercise":"30 min walk, strength 2x/week"},
-    {"condition":"Sleep Apnea","diet":"Avoid caffeine late, light dinner","exercise":"Breathing exercises, positional sleep"},
-    {"condition":"Heart Risk","diet":"Low saturated fats, high fiber","exercise":"Low-impact cardio, consult physician"}
-])
-demo_examples.to_csv("healthyhabits_demo_examples.csv", index=False)